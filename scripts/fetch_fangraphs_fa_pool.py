@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""Fetch the CBL free-agent pool leaderboards from FanGraphs.
+
+Pulls season / vs-L / vs-R lines for the players currently in the CBL
+free-agent pool and writes one JSON file per table into data/fa/, which
+CBL_Free_Agent_Pool.html loads client-side.  Runs daily from the
+fa-pool GitHub Action.
+"""
+
+import io
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, is_dataclass
+from pathlib import Path
+
+import ijson
+import numpy as np
+import orjson
+import requests_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+SEASON = 2025
+BATCH_SIZE = 40
+
+# "json" for the pool page; "json+parquet" also writes columnar files
+# for analytics consumers (needs polars installed).
+OUT_FORMAT = "json"
+
+API = "https://www.fangraphs.com/api/leaders/major-league/data"
+
+OUT_DIR = Path(__file__).resolve().parents[1] / "data" / "fa"
+
+# FanGraphs playerids for the current FA pool, by role.  Update these
+# alongside the pool page when players sign or are released.
+SEGMENTS = {
+    "bat": [
+        1652, 1884, 3018, 3275, 3339, 3672, 4088, 4210, 4353, 5385,
+        6469, 6862, 6882, 7126, 7242, 7898, 7946, 8846, 8849, 10027,
+        10190, 10248, 10787, 10886, 11680, 12419, 14386, 15992, 16257, 16411,
+        16516, 17447, 17968, 18940, 20093, 21371, 22027, 22136, 23761, 23837,
+        23862, 23938, 24936, 26903, 27663, 27880, 27922, 28169, 28520, 28737,
+        29469, 29470, 31995, 32566, 32603, 32988,
+    ],
+    "sp": [
+        2109, 6483, 7320, 8929, 9236, 9406, 12410, 13050, 14120, 15251,
+        15876, 16315, 18767, 19222, 19736, 20285, 22422, 23613, 26175, 27310,
+        31579, 31618, 31764, 32283,
+    ],
+    "rp": [
+        1302, 1396, 1500, 2082, 2465, 2695, 2855, 2883, 3525, 3632,
+        4763, 5129, 5345, 5361, 6020, 6075, 8317, 8323, 8602, 9175,
+        10474, 10612, 10810, 11266, 11424, 12441, 13050, 13177, 13389, 13891,
+        14120, 14677, 15763, 16165, 16529, 16548, 16703, 16873, 16908, 16987,
+        17057, 17521, 17669, 18367, 18526, 18791, 19222, 19732, 19736, 19981,
+        20099, 20846, 20871, 22106, 23051, 23359, 24656, 25531, 25940, 26057,
+        26507, 27693, 27807, 28201, 28507, 28794, 29218, 29227, 29406, 29968,
+        30273, 30821, 30837, 31450, 31764, 32619, 32939,
+    ],
+}
+
+# Custom "standard" hitter columns shown on the pool page.  Field order
+# is display order (orjson serializes dataclasses in field order, and the
+# page takes its columns from the first row's keys).  slots=True drops
+# the per-row dict, cutting normalized-row memory several times over.
+@dataclass(slots=True)
+class HitterRow:
+    Bats: str = ""
+    Name: str = ""
+    Team: str = ""
+    G: str = ""
+    PA: str = ""
+    AB: str = ""
+    R: str = ""
+    H: str = ""
+    HR: str = ""
+    RBI: str = ""
+    BB: str = ""
+    IBB: str = ""
+    SO: str = ""
+    HBP: str = ""
+    SF: str = ""
+    SH: str = ""
+    SB: str = ""
+    CS: str = ""
+    AVG: str = ""
+    OBP: str = ""
+    SLG: str = ""
+    OPS: str = ""
+    WAR: str = ""
+
+# The sp/rp pools overlap (swingmen sit in both), so pitchers are
+# fetched once per month as the union and partitioned locally; keys are
+# strings to match _row_key.
+PIT_UNION = sorted(set(SEGMENTS["sp"]) | set(SEGMENTS["rp"]))
+SP_KEYS = {str(p) for p in SEGMENTS["sp"]}
+RP_KEYS = {str(p) for p in SEGMENTS["rp"]}
+
+# (output file stem, SEGMENTS key, stats type, FanGraphs month code)
+# month 0 = full season, 13 = vs L, 14 = vs R.
+HITTER_TASKS = [
+    ("hit_bat_all", "bat", "bat", 0),
+    ("hit_bat_lhp", "bat", "bat", 13),
+    ("hit_bat_rhp", "bat", "bat", 14),
+]
+
+# month code -> suffix of the sp_pit_*/rp_pit_* output files.
+PITCH_MONTHS = [(0, "all"), (13, "lhb"), (14, "rhb")]
+
+# One Session for the whole run: urllib3 keeps the connection to
+# fangraphs.com alive, so we pay the TLS handshake once instead of on
+# every batch.  The on-disk cache revalidates with If-None-Match, so
+# daily reruns where FanGraphs hasn't changed get cheap 304s.
+OUT_DIR.mkdir(parents=True, exist_ok=True)
+SESSION = requests_cache.CachedSession(
+    str(OUT_DIR / ".http_cache"),
+    expire_after=3600,
+    cache_control=True,
+    allowable_methods=("GET",),
+)
+# Retries live at the adapter layer: jittered exponential backoff so
+# the worker threads don't resync under a 429 storm, and Retry-After
+# from FanGraphs is honored.
+_RETRY = Retry(
+    total=6,
+    backoff_factor=1.5,
+    backoff_jitter=2.0,
+    status_forcelist=(429, 403, 502, 503, 504),
+    respect_retry_after_header=True,
+)
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                                      max_retries=_RETRY))
+SESSION.headers.update({
+    "User-Agent": ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+                   "AppleWebKit/537.36 (KHTML, like Gecko) "
+                   "Chrome/124.0 Safari/537.36"),
+    "Accept": "application/json, text/plain, */*",
+    # JSON compresses ~5-10x; urllib3 decompresses transparently.
+    "Accept-Encoding": "gzip, br",
+    "Referer": "https://www.fangraphs.com/leaders/major-league",
+})
+
+
+def base_params(stats, month):
+    """Query params shared by every batch of a task; only the players
+    list changes per call, merged in with `|` at the call site."""
+    return {
+        "ind": "0",
+        "lg": "all",
+        "pos": "all",
+        "qual": "0",
+        "season": str(SEASON),
+        "season1": str(SEASON),
+        "stats": stats,
+        "month": str(month),
+        "team": "0,ts",
+        "rost": "0",
+        "type": "8",
+        "sortcol": "17",
+        "sortdir": "default",
+        "pageitems": "500",
+        "pagenum": "1",
+    }
+
+
+def _parse_rows_only(resp):
+    """Parse just the rows array out of a leaders response.
+
+    The payloads carry pagination metadata and stat definitions that
+    normalize_rows immediately discards; ijson materializes only the
+    "data" items, so those objects are never built.  The cache layer
+    has already buffered the body (and its decoder state makes raw
+    reads unsafe), so parse from resp.content; use_float keeps numbers
+    as float so orjson can serialize the rows.
+    """
+    return {"data": list(ijson.items(io.BytesIO(resp.content), "data.item",
+                                     use_float=True))}
+
+
+def call_api(params):
+    r = SESSION.get(API, params=params, timeout=60)
+    r.raise_for_status()
+    return _parse_rows_only(r)
+
+
+def chunk(lst, n):
+    for i in range(0, len(lst), n):
+        yield lst[i:i + n]
+
+
+# Rows key discovered from the first payload; the endpoint always uses
+# the same one ("data" in practice), so later payloads skip the scan.
+_DATA_KEY = None
+
+
+def normalize_rows(payload):
+    """Pull the list of row dicts out of a leaders payload."""
+    global _DATA_KEY
+    if isinstance(payload, dict):
+        if _DATA_KEY:
+            v = payload.get(_DATA_KEY)
+            if isinstance(v, list):
+                return [r for r in v if isinstance(r, dict)]
+        for k in ("data", "rows", "result", "results"):
+            v = payload.get(k)
+            if isinstance(v, list):
+                _DATA_KEY = k
+                return [r for r in v if isinstance(r, dict)]
+    if isinstance(payload, list):
+        return [r for r in payload if isinstance(r, dict)]
+    return []
+
+
+def _row_key(r):
+    pid = (r.get("playerid") or r.get("PlayerId") or r.get("playerId")
+           or r.get("ID") or r.get("id"))
+    if pid:
+        return str(pid).strip()
+    return str(r.get("Name", "")).strip() + "|" + str(r.get("Team", "")).strip()
+
+
+# Rate stats often arrive pre-formatted ("0.312", or "1.023" for OPS);
+# skip the float round-trip for those.
+_RATE_RE = re.compile(r"^\d\.\d{3}$")
+
+
+def fmt3(v):
+    if v is None or v == "":
+        return ""
+    if isinstance(v, str) and _RATE_RE.match(v):
+        return v
+    try:
+        return f"{float(v):.3f}"
+    except Exception:
+        return v
+
+
+# Output column -> candidate payload keys, in HitterRow field order so
+# the row can be built positionally.
+_ALIASES = [
+    ("Bats", ("Bats", "Bat", "B")),
+    ("Name", ("Name", "Player", "playerName", "PlayerName")),
+    ("Team", ("Team", "team", "TeamName")),
+    ("G", ("G", "g")),
+    ("PA", ("PA", "pa")),
+    ("AB", ("AB", "ab")),
+    ("R", ("R", "r")),
+    ("H", ("H", "h")),
+    ("HR", ("HR", "hr")),
+    ("RBI", ("RBI", "rbi")),
+    ("BB", ("BB", "bb")),
+    ("IBB", ("IBB", "ibb")),
+    ("SO", ("SO", "K", "so")),
+    ("HBP", ("HBP", "hbp")),
+    ("SF", ("SF", "sf")),
+    ("SH", ("SH", "sh")),
+    ("SB", ("SB", "sb")),
+    ("CS", ("CS", "cs")),
+    ("AVG", ("AVG", "avg", "BA")),
+    ("OBP", ("OBP", "obp")),
+    ("SLG", ("SLG", "slg")),
+    ("OPS", ("OPS", "ops")),
+    ("WAR", ("WAR", "war")),
+]
+_FMT3_KEYS = {"AVG", "OBP", "SLG", "OPS"}
+# Columns drawn from tiny value sets (handedness, 30 team codes): intern
+# so hundreds of rows share one string object per distinct value.
+_INTERN_COLS = {"Bats", "Team"}
+_MISSING = object()
+
+
+def fmt3_bulk(rows):
+    """Format the rate columns of raw payload rows in one NumPy pass.
+
+    C-level formatting beats per-row fmt3 once the list is big enough;
+    columns with non-numeric values are left for the scalar path.
+    """
+    for col in ("AVG", "OBP", "SLG", "OPS"):
+        raw = [r.get(col) for r in rows]
+        try:
+            vals = np.array([np.nan if v is None or v == "" else v
+                             for v in raw], dtype=np.float64)
+        except (TypeError, ValueError):
+            continue
+        formatted = np.char.mod("%.3f", vals)
+        blank = np.isnan(vals)
+        for r, s, b in zip(rows, formatted, blank):
+            if col in r:
+                r[col] = "" if b else s
+
+
+def normalize_hitter(row):
+    vals = []
+    for col, keys in _ALIASES:
+        v = ""
+        for k in keys:
+            v2 = row.get(k, _MISSING)
+            if v2 is not _MISSING:
+                v = v2
+                break
+        if col in _FMT3_KEYS:
+            v = fmt3(v)
+        elif col in _INTERN_COLS:
+            # Guard falsy values: str(None) would store the text "None".
+            v = sys.intern(str(v)) if v else ""
+        vals.append(v)
+    return HitterRow(*vals)
+
+
+# (stats, month, batch) -> normalized row list.  The sp/rp segments share
+# many playerids, so identical batches recur across tasks; a hit replaces
+# an HTTP round-trip (and re-normalization) with a dict lookup.  Worst
+# case for the racy check under the thread pool is one duplicate fetch.
+_ROWS_CACHE = {}
+
+# At most 4 batch requests in flight across all tasks; each worker still
+# pauses 0.6s after a network fetch, so this doubles as the rate limit.
+_BATCH_POOL = ThreadPoolExecutor(max_workers=4)
+
+
+def _fetch_batch(bp, stats, month, batch):
+    key = (stats, month, tuple(batch))
+    batch_rows = _ROWS_CACHE.get(key)
+    if batch_rows is None:
+        payload = call_api(bp | {"players": ",".join(str(p) for p in batch)})
+        batch_rows = normalize_rows(payload)
+        _ROWS_CACHE[key] = batch_rows
+        time.sleep(0.6)
+    return batch_rows
+
+
+def fetch_batched(players, stats, month, batch_size=BATCH_SIZE):
+    # Issue every batch up front and merge in submission order, so the
+    # per-task result is deterministic while the round-trips overlap.
+    bp = base_params(stats, month)
+    futures = [_BATCH_POOL.submit(_fetch_batch, bp, stats, month, batch)
+               for batch in chunk(players, batch_size)]
+    seen = set()
+    merged = []
+    for fut in futures:
+        for r in fut.result():
+            key = _row_key(r)
+            if key not in seen:
+                seen.add(key)
+                merged.append(r)
+    return merged
+
+
+def save_json(name, rows):
+    path = OUT_DIR / f"{name}.json"
+    payload = orjson.dumps(rows)
+    try:
+        unchanged = path.read_bytes() == payload
+    except OSError:
+        unchanged = False
+    if unchanged:
+        # Leave mtime alone so CDN cache headers stay valid.
+        print(f"unchanged {path.relative_to(OUT_DIR.parents[1])}")
+    else:
+        # Write-then-rename so a killed job never leaves a truncated
+        # file for the page (or the Action's commit) to pick up.
+        tmp = path.with_suffix(".json.tmp")
+        tmp.write_bytes(payload)
+        os.replace(tmp, path)
+        print(f"wrote {path.relative_to(OUT_DIR.parents[1])} ({len(rows)} rows)")
+    if "parquet" in OUT_FORMAT:
+        import polars as pl
+
+        data = [asdict(r) if is_dataclass(r) else r for r in rows]
+        pl.DataFrame(data).write_parquet(OUT_DIR / f"{name}.parquet",
+                                         compression="zstd")
+
+
+def fetch_and_save(out_name, seg_key, stats, month):
+    rows = fetch_batched(SEGMENTS[seg_key], stats, month)
+    if stats == "bat":
+        if len(rows) > 32:
+            fmt3_bulk(rows)
+        rows = [normalize_hitter(r) for r in rows]
+    save_json(out_name, rows)
+
+
+def fetch_and_save_pitchers(month, suffix):
+    # One request covers both roles: the whole union fits well under
+    # pageitems=500, so don't split it into BATCH_SIZE chunks.
+    rows = fetch_batched(PIT_UNION, "pit", month, batch_size=len(PIT_UNION))
+    save_json(f"sp_pit_{suffix}", [r for r in rows if _row_key(r) in SP_KEYS])
+    save_json(f"rp_pit_{suffix}", [r for r in rows if _row_key(r) in RP_KEYS])
+
+
+def main():
+    # The work is all waiting on FanGraphs, so overlap the tasks; three
+    # workers keeps us well under the server's rate tolerance (the
+    # per-batch sleep in fetch_batched stays as the politeness throttle).
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        futs = [ex.submit(fetch_and_save, *t) for t in HITTER_TASKS]
+        futs += [ex.submit(fetch_and_save_pitchers, m, sfx)
+                 for m, sfx in PITCH_MONTHS]
+        for f in futs:
+            f.result()
+
+
+if __name__ == "__main__":
+    main()